@@ -0,0 +1,123 @@
+# Copyright (c) 2021-2021 Mediapills Dependency Injection Authors.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Compare per-key and bulk registration and resolution.
+
+Usage: python benchmarks/bulk.py [ENTRIES] [BATCH]
+"""
+import sys
+import time
+import timeit
+import typing as t
+
+from mediapills.dependency_injection import Container
+
+
+def definitions(entries: int) -> t.Dict[str, t.Any]:
+    """Return service definitions for the specified number of entries."""
+    return {"service.{}".format(i): lambda di: object() for i in range(entries)}
+
+
+def cold_repeat(
+    func: t.Callable[[Container], None], definitions: t.Mapping[str, t.Any], repeat: int
+) -> float:
+    """Return the best time of a benchmark run on a new container, leaving the
+    container creation out of the measurement.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        container = Container(definitions)
+        start = time.perf_counter()
+        func(container)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def report(name: str, seconds: float, keys: int) -> None:
+    """Print the cost per key of a benchmark."""
+    print("{:<28} {:>10.1f} ns/key".format(name, seconds / keys * 1e9))
+
+
+def main() -> None:
+    """Print per-key cost of registration and resolution."""
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    repeat = 5
+
+    def setitem() -> None:
+        container = Container()
+        for key, value in definitions(entries).items():
+            container[key] = value
+
+    def register_many() -> None:
+        Container().register_many(definitions(entries))
+
+    report("__setitem__", min(timeit.repeat(setitem, number=1, repeat=repeat)), entries)
+    report(
+        "register_many",
+        min(timeit.repeat(register_many, number=1, repeat=repeat)),
+        entries,
+    )
+
+    container = Container(definitions(entries))
+    keys = list(container)
+    batches: t.List[t.List[str]] = []
+    for start in range(0, entries, batch):
+        stop = start + batch
+        batches.append(keys[start:stop])
+    raw = dict(container.definitions())
+
+    def cold_getitem(cold: Container) -> None:
+        for keys in batches:
+            for key in keys:
+                _ = cold[key]
+
+    def cold_get_many(cold: Container) -> None:
+        for keys in batches:
+            cold.get_many(keys)
+
+    report("cold __getitem__", cold_repeat(cold_getitem, raw, repeat), entries)
+    report("cold get_many", cold_repeat(cold_get_many, raw, repeat), entries)
+
+    container.copy()
+
+    def warm_getitem() -> None:
+        for keys in batches:
+            for key in keys:
+                _ = container[key]
+
+    def warm_get_many() -> None:
+        for keys in batches:
+            container.get_many(keys)
+
+    def warm_get_all() -> None:
+        container.get_many(keys)
+
+    for name, func in (
+        ("warm __getitem__", warm_getitem),
+        ("warm get_many", warm_get_many),
+        ("warm get_many (all keys)", warm_get_all),
+    ):
+        report(name, min(timeit.repeat(func, number=1, repeat=repeat)), entries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Copyright (c) 2021-2021 Mediapills Dependency Injection Authors.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Measure lookup throughput of built services while scaling reader threads.
+
+Usage: python benchmarks/contention.py [MAX_THREADS] [LOOKUPS_PER_THREAD]
+
+On a free-threaded interpreter throughput is expected to grow with the number
+of cores, since reading a built service takes no lock.
+"""
+import os
+import sys
+import threading
+import time
+import typing as t
+
+from mediapills.dependency_injection import Container
+
+SERVICES = 100
+
+
+def run(container: Container, threads: int, lookups: int) -> float:
+    """Return lookups per second performed by the specified number of readers."""
+    keys = list(container)
+    barrier = threading.Barrier(threads)
+    spans: t.List[t.Tuple[float, float]] = []
+
+    def reader() -> None:
+        barrier.wait()
+        start = time.perf_counter()
+        for i in range(lookups):
+            _ = container[keys[i % SERVICES]]
+        spans.append((start, time.perf_counter()))
+
+    workers = [threading.Thread(target=reader) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    elapsed = max(end for _, end in spans) - min(start for start, _ in spans)
+
+    return threads * lookups / elapsed
+
+
+def main() -> None:
+    """Print throughput for 1 to N reader threads."""
+    max_threads = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+    container = Container(
+        {"service.{}".format(i): lambda di: object() for i in range(SERVICES)}
+    )
+    container.copy()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print("GIL enabled: {}".format(gil))
+
+    base = run(container, 1, lookups)
+    for threads in range(1, max_threads + 1):
+        throughput = base if threads == 1 else run(container, threads, lookups)
+        print(
+            "{:>3} threads: {:>12,.0f} lookups/s ({:.2f}x)".format(
+                threads, throughput, throughput / base
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -19,8 +19,13 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 import inspect
+import json
+import threading
 import types
 import typing as t
+from collections.abc import KeysView
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from functools import update_wrapper
 from functools import wraps
 
@@ -28,6 +33,11 @@
 from mediapills.dependency_injection.exceptions import FrozenServiceException
 from mediapills.dependency_injection.exceptions import RecursionInfiniteLoopError
 from mediapills.dependency_injection.exceptions import UnknownIdentifierException
+from mediapills.dependency_injection.memory import MemoryReport
+from mediapills.dependency_injection.memory import MemoryTracker
+from mediapills.dependency_injection.views import DefinitionsView
+from mediapills.dependency_injection.views import LazyItemsView
+from mediapills.dependency_injection.views import LazyValuesView
 
 __all__ = ["Container"]
 
@@ -60,6 +70,9 @@
     ]
 )
 
+"""Version of the warm up manifest file format."""
+MANIFEST_VERSION = 1
+
 
 # class ServiceMode(Enum):
 #     COMMON = SERVICE_MODE_COMMON
@@ -82,6 +95,30 @@ def wrapped(*args: t.List[t.Any], **kwargs: t.Dict[t.Any, t.Any]) -> t.Any:
     return wrapped
 
 
+"""Offset of a mounted container not visible under a namespace prefix."""
+_HIDDEN = object()
+
+
+def _prefixed(prefix: str, key: t.Any) -> t.Any:
+    """Return the offset under which a mounted offset is visible."""
+    if not prefix:
+        return key
+
+    return prefix + key if isinstance(key, str) else _HIDDEN
+
+
+def _unprefixed(prefix: str, key: t.Any) -> t.Any:
+    """Return the mounted container offset visible under specified offset."""
+    if not prefix:
+        return key
+
+    if isinstance(key, str) and key.startswith(prefix):
+        n = len(prefix)
+        return key[n:]
+
+    return _HIDDEN
+
+
 class Container(dict):  # type: ignore
     """Container DI implementation."""
 
@@ -93,6 +130,15 @@ def __init__(self, *args, **kw) -> None:  # type: ignore
         self._protected: t.Set[t.Any] = set()
         self._frozen: t.Set[t.Any] = set()
         self._templates: t.Set[t.Any] = set()
+        self._memory: t.Optional[MemoryTracker] = None
+        self._index: t.Dict[t.Any, t.Tuple[Container, t.Any]] = dict()
+        self._mounts: t.List[t.Tuple[Container, str]] = []
+        self._parents: t.List[t.Tuple[Container, str]] = []
+        self._mutex = threading.Lock()
+        self._building: t.Dict[t.Any, t.List[t.Any]] = dict()
+        self._waiting: t.Dict[int, t.Any] = dict()
+        self._recorded: t.Optional[t.Dict[t.Any, None]] = None
+        self._record_limit: t.Optional[int] = None
 
     def _freeze(self) -> None:
         """Warm up all offsets."""
@@ -100,32 +146,183 @@ def _freeze(self) -> None:
             if k not in self._frozen:
                 self.__getitem__(k)
 
-    @handle_unknown_identifier
     def __getitem__(self, key: t.Any) -> t.Any:
         """Return the value at specified offset."""
         # TODO: add __dependency_injection_result__ attr
+        if self._memory is not None:
+            self._memory.touch(key)
+
+        # Objects are published before their offset is added to _raw, so the
+        # read path of built objects needs neither locks nor shared writes.
+        if key in self._raw:
+            return dict.__getitem__(self, key)
+
+        if not dict.__contains__(self, key):
+            if key not in self._index:
+                raise UnknownIdentifierException(key)
+
+            owner, origin = self._index[key]
+            if self._recorded is None or origin in owner._raw:
+                return owner[origin]
+
+            value = owner[origin]
+            if origin in owner._raw:
+                self._record(key)
+            return value
+
         if key in self._protected:
             return dict.__getitem__(self, key)(self)
 
         raw = dict.__getitem__(self, key)
 
-        if key in self._raw or not hasattr(raw, "__call__") or inspect.isclass(raw):
+        if not hasattr(raw, "__call__") or inspect.isclass(raw):
             return raw
 
-        dict.__setitem__(
-            self,
-            key,
-            lambda di, k=key: (_ for _ in ()).throw(RecursionInfiniteLoopError(k)),
+        if getattr(raw, "__dependency_injection_depends__", None):
+            self._resolve((key,))
+            return dict.__getitem__(self, key)
+
+        return self._build(key)
+
+    def _unbuilt(self, key: t.Any) -> bool:
+        """Check whether an own offset holds an object yet to be built."""
+        if key in self._raw or key in self._protected:
+            return False
+
+        raw = dict.get(self, key)
+
+        return hasattr(raw, "__call__") and not inspect.isclass(raw)
+
+    def _resolve(self, keys: t.Iterable[t.Any]) -> None:
+        """Build objects at specified offsets after their declared
+        dependencies, using an explicit work stack instead of recursion.
+        """
+        done: t.Set[t.Any] = set()
+
+        for root in keys:
+            if root in done or not self._unbuilt(root):
+                continue
+
+            depends = self._depends(root)
+            if not depends:
+                self._build(root)
+                continue
+
+            path = [root]
+            visiting = {root}
+            pending = [iter(depends)]
+
+            while path:
+                for dep in pending[-1]:
+                    if dep in visiting:
+                        raise RecursionInfiniteLoopError(dep, (*path, dep))
+
+                    if dep not in self:
+                        raise UnknownIdentifierException(dep)
+
+                    if dep not in done and self._unbuilt(dep):
+                        path.append(dep)
+                        visiting.add(dep)
+                        pending.append(iter(self._depends(dep)))
+                        break
+                else:
+                    key = path.pop()
+                    visiting.discard(key)
+                    pending.pop()
+
+                    self._build(key)
+                    done.add(key)
+
+    def _depends(self, key: t.Any) -> t.Sequence[t.Any]:
+        """Return offsets an own offset declares as dependencies."""
+        depends: t.Sequence[t.Any] = getattr(
+            dict.get(self, key), "__dependency_injection_depends__", ()
         )
 
-        result = raw(self)
+        return depends
+
+    def _build(self, key: t.Any, ident: t.Optional[int] = None) -> t.Any:
+        """Build the object at specified offset once, concurrent first lookups
+        of the same offset wait for it. Raise an exception instead of waiting
+        when the offset is being built by this thread, or by threads waiting
+        for this one.
+        """
+        claim = [ident or threading.get_ident(), None]
+
+        # The offset is claimed with an atomic setdefault, only threads that
+        # have to wait for another one take the mutex.
+        building = self._building.setdefault(key, claim)
+        while building is not claim:
+            self._wait(key, building)
+
+            if key in self._raw:
+                return dict.__getitem__(self, key)
+
+            building = self._building.setdefault(key, claim)
+
+        if key in self._raw:
+            self._built(key, claim)
+            return dict.__getitem__(self, key)
+
+        raw = dict.__getitem__(self, key)
+        try:
+            if self._memory is None:
+                result = raw(self)
+            else:
+                result = self._memory.build(key, raw, self)
+        except BaseException:
+            self._built(key, claim)
+            raise
+
         dict.__setitem__(self, key, result)
         self._raw[key] = raw
-
         self._frozen.add(key)
+        self._built(key, claim)
+
+        if self._recorded is not None:
+            self._record(key)
 
         return result
 
+    def _wait(self, key: t.Any, building: t.List[t.Any]) -> None:
+        """Wait for another thread to build an offset."""
+        ident = threading.get_ident()
+
+        with self._mutex:
+            owner: int = building[0]
+            seen: t.Set[int] = set()
+            while owner not in seen:
+                if owner == ident:
+                    raise RecursionInfiniteLoopError(key)
+                seen.add(owner)
+
+                if owner not in self._waiting:
+                    break
+                claim = self._building.get(self._waiting[owner])
+                if claim is None:
+                    break
+                owner = claim[0]
+
+            event: t.Optional[threading.Event] = building[1]
+            if event is None:
+                event = building[1] = threading.Event()
+            self._waiting[ident] = key
+
+        try:
+            # The builder reads the event after releasing its claim.
+            if self._building.get(key) is building:
+                event.wait()
+        finally:
+            with self._mutex:
+                del self._waiting[ident]
+
+    def _built(self, key: t.Any, claim: t.List[t.Any]) -> None:
+        """Release the claim on an offset and wake up waiting threads."""
+        del self._building[key]
+
+        if claim[1] is not None:
+            claim[1].set()
+
     def __setitem__(self, key: t.Any, val: t.Any) -> None:
         """Assign a value to the specified offset."""
         if key in self._frozen:
@@ -134,8 +331,46 @@ def __setitem__(self, key: t.Any, val: t.Any) -> None:
         if callable(val) and not hasattr(val, "__dependency_injection_mode__"):
             val.__dependency_injection_mode__ = SERVICE_MODE_COMMON
 
+        added = not dict.__contains__(self, key)
         dict.__setitem__(self, key, val)
 
+        if added and self._parents:
+            self._reindex_parents(key)
+
+    def __contains__(self, key: t.Any) -> bool:
+        """Check whether an offset is defined or mounted."""
+        return dict.__contains__(self, key) or key in self._index
+
+    def get(self, key: t.Any, default: t.Any = None) -> t.Any:
+        """Return the value stored at specified offset, looking up mounted
+        offsets in the container owning them.
+        """
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+
+        entry = self._index.get(key)
+        if entry is None:
+            return default
+
+        owner, origin = entry
+
+        return owner.get(origin, default)
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        """Iterate over own offsets, then mounted ones."""
+        yield from dict.__iter__(self)
+        yield from self.mounted()
+
+    def __len__(self) -> int:
+        """Return the number of own and mounted offsets."""
+        return dict.__len__(self) + sum(1 for _ in self.mounted())
+
+    def mounted(self) -> t.Iterator[t.Any]:
+        """Iterate over mounted offsets not shadowed by own offsets."""
+        for key in list(self._index):
+            if not dict.__contains__(self, key):
+                yield key
+
     def __delitem__(self, key: t.Any) -> None:
         """Unset an offset."""
         # TODO: implement for factories
@@ -146,6 +381,12 @@ def __delitem__(self, key: t.Any) -> None:
 
         dict.__delitem__(self, key)
 
+        if self._memory is not None:
+            self._memory.forget(key)
+
+        if self._parents:
+            self._reindex_parents(key)
+
     def clear(self) -> None:
         """Remove all offsets."""
         # TODO: implement for factories
@@ -154,43 +395,266 @@ def clear(self) -> None:
         self._frozen.clear()
         self._raw.clear()
 
+        keys = list(dict.keys(self)) if self._parents or self._memory is not None else []
         dict.clear(self)
 
-    def values(self) -> t.Any:
-        """Return a new view of the dictionary’s values."""
-        self._freeze()
+        for key in keys:
+            if self._memory is not None:
+                self._memory.forget(key)
+            self._reindex_parents(key)
 
-        return dict.values(self)
+    def keys(self) -> t.Any:
+        """Return a new view of own and mounted offsets."""
+        return KeysView(self)
+
+    def values(self) -> t.Any:
+        """Return a new view of the dictionary’s values resolved on demand."""
+        return LazyValuesView(self)
 
     def items(self) -> t.Any:
-        """Return a new view of the dictionary’s items."""
-        self._freeze()
+        """Return a new view of the dictionary’s items resolved on demand."""
+        return LazyItemsView(self)
+
+    def definitions(self) -> DefinitionsView:
+        """Return a view of parameters and closures without building objects."""
+        return DefinitionsView(self)
+
+    def scan(
+        self, prefix: t.Optional[str] = None, mode: t.Optional[int] = None
+    ) -> t.Iterator[t.Any]:
+        """Iterate over offsets matching a key prefix and/or a service mode
+        without building objects.
+        """
+        for key in list(dict.keys(self)):
+            if prefix is not None and not (
+                isinstance(key, str) and key.startswith(prefix)
+            ):
+                continue
 
-        return dict.items(self)
+            if mode is not None:
+                raw = self._raw.get(key, dict.get(self, key))
+                if not getattr(raw, "__dependency_injection_mode__", 0) & mode:
+                    continue
+
+            yield key
 
     def copy(self) -> t.Any:
         """Return a shallow copy of the dictionary."""
         self._freeze()
 
-        return dict.copy(self)
+        copy = dict.copy(self)
+        for key in self.mounted():
+            copy[key] = self.__getitem__(key)
+
+        return copy
 
     def update(self, others: t.Union[dict, t.MutableMapping]) -> None:  # type: ignore
         """Update the dictionary with the key/value pairs from other,
         overwriting existing keys.
         """
-        for key, value in others.items():
-            self.__setitem__(key, value)
+        self.register_many(others)
 
-        return dict.update(self)
+    def register_many(
+        self, others: t.Union[t.Mapping[t.Any, t.Any], t.Iterable[t.Tuple[t.Any, t.Any]]]
+    ) -> None:
+        """Assign values to offsets validating the whole batch once and
+        inserting it in a single pass.
+        """
+        # Mappings are read through items(), so objects built by another
+        # container are shared rather than built again from its definitions.
+        pairs = others.items() if isinstance(others, Mapping) else others
+        batch = dict(pairs)
+
+        frozen = self._frozen.intersection(batch)
+        if frozen:
+            raise FrozenServiceException(*frozen)
+
+        for val in batch.values():
+            if callable(val) and not hasattr(val, "__dependency_injection_mode__"):
+                val.__dependency_injection_mode__ = SERVICE_MODE_COMMON
+
+        added = [k for k in batch if not dict.__contains__(self, k)]
+        dict.update(self, batch)
+
+        for key in added if self._parents else ():
+            self._reindex_parents(key)
+
+    def get_many(self, keys: t.Iterable[t.Any]) -> t.Dict[t.Any, t.Any]:
+        """Return values at specified offsets resolved in a single call."""
+        built = self._raw
+        value = super().__getitem__
+        defined = super().__contains__
+
+        result = dict()
+        cold = []
+        delegated = []
+        for key in keys:
+            if key in built:
+                result[key] = value(key)
+            elif defined(key):
+                result[key] = None
+                cold.append(key)
+            elif key in self._index:
+                result[key] = None
+                delegated.append(key)
+            else:
+                raise UnknownIdentifierException(key)
+
+        if self._memory is not None:
+            for key in result:
+                self._memory.touch(key)
+
+        roots = []
+        ident = threading.get_ident()
+        for key in cold:
+            if key in built:
+                result[key] = value(key)
+            elif key in self._protected:
+                delegated.append(key)
+            else:
+                raw = value(key)
+                if not hasattr(raw, "__call__") or isinstance(raw, type):
+                    result[key] = raw
+                elif getattr(raw, "__dependency_injection_depends__", None):
+                    roots.append(key)
+                else:
+                    result[key] = self._build(key, ident)
+
+        if roots:
+            self._resolve(roots)
+            for key in roots:
+                result[key] = value(key)
+
+        for key in delegated:
+            result[key] = self.__getitem__(key)
+
+        return result
+
+    def mount(self, container: "Container", prefix: str = "") -> None:
+        """Make offsets of another container available, optionally under a
+        namespace prefix. Mounted objects are built and owned by the mounted
+        container, own offsets and later mounts take precedence.
+        """
+        ancestors = [self]
+        while ancestors:
+            ancestor = ancestors.pop()
+            if ancestor is container:
+                raise ValueError(container)
+            ancestors.extend(parent for parent, _ in ancestor._parents)
+
+        self._mounts.append((container, prefix))
+        container._parents.append((self, prefix))
+
+        for key in [*dict.keys(container), *container._index]:
+            mounted = _prefixed(prefix, key)
+            if mounted is not _HIDDEN:
+                self._reindex(mounted)
+
+    def _entry(self, key: t.Any) -> t.Optional[t.Tuple["Container", t.Any]]:
+        """Return the container owning an offset and its offset in there."""
+        if dict.__contains__(self, key):
+            return self, key
+
+        return self._index.get(key)
+
+    def _reindex(self, key: t.Any) -> None:
+        """Refresh the lookup index for an offset provided by mounts."""
+        entry = None
+        for container, prefix in self._mounts:
+            origin = _unprefixed(prefix, key)
+            if origin is not _HIDDEN:
+                entry = container._entry(origin) or entry
+
+        if entry is None:
+            self._index.pop(key, None)
+        else:
+            self._index[key] = entry
+
+        self._reindex_parents(key)
+
+    def _reindex_parents(self, key: t.Any) -> None:
+        """Refresh the lookup index of containers this one is mounted on."""
+        for parent, prefix in self._parents:
+            mounted = _prefixed(prefix, key)
+            if mounted is not _HIDDEN:
+                parent._reindex(mounted)
 
     @handle_unknown_identifier
     def raw(self, key: t.Any) -> t.Any:
         """Get a parameter or the closure defining an object."""
+        if not dict.__contains__(self, key):
+            owner, origin = self._index[key]
+            return owner.raw(origin)
+
         if key in self._raw:
             return self._raw[key]
 
         return dict.__getitem__(self, key)
 
+    def record(self, limit: t.Optional[int] = None) -> None:
+        """Start recording offsets in the order their objects get built,
+        up to the specified number of offsets.
+        """
+        self._recorded = dict()
+        self._record_limit = limit
+
+    def _record(self, key: t.Any) -> None:
+        """Append an offset to the warm up manifest being recorded."""
+        with self._mutex:
+            recorded = self._recorded
+            if recorded is None or key in recorded:
+                return
+
+            if self._record_limit is None or len(recorded) < self._record_limit:
+                recorded[key] = None
+
+    def save_manifest(self, path: str) -> None:
+        """Save recorded offsets as a warm up manifest file."""
+        with self._mutex:
+            if self._recorded is None:
+                raise RuntimeError("Recording is disabled")
+
+            keys = [k for k in self._recorded if isinstance(k, (str, int))]
+
+        with open(path, "w") as fp:
+            json.dump({"version": MANIFEST_VERSION, "keys": keys}, fp)
+
+    def warm_up(self, path: str, workers: int = 1) -> t.List[t.Any]:
+        """Build objects listed in a warm up manifest file, optionally in
+        parallel, leaving other offsets lazy. Return warmed offsets.
+        """
+        with open(path) as fp:
+            manifest = json.load(fp)
+
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(manifest.get("version"))
+
+        keys = [k for k in manifest.get("keys", []) if k in self]
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(self.__getitem__, keys))
+        else:
+            for key in keys:
+                self.__getitem__(key)
+
+        return keys
+
+    def track_memory(self, enabled: bool = True) -> None:
+        """Turn on or off memory accounting of service factories."""
+        if enabled and self._memory is None:
+            self._memory = MemoryTracker()
+        elif not enabled and self._memory is not None:
+            self._memory.stop()
+            self._memory = None
+
+    def memory_report(self) -> MemoryReport:
+        """Return memory footprints of services built while tracking."""
+        if self._memory is None:
+            raise RuntimeError("Memory tracking is disabled")
+
+        return MemoryReport(self._memory, self)
+
     def template(self, key: str, template: str) -> None:
         """Format the specified value(s) and insert them inside the string's
         placeholder.
@@ -217,9 +681,14 @@ def _cp_func(func: t.Any) -> t.Any:
         return update_wrapper(copy, func)
 
     def service(  # dead: disable
-        self, key: str, mode: int = SERVICE_MODE_COMMON
+        self,
+        key: str,
+        mode: int = SERVICE_MODE_COMMON,
+        depends: t.Sequence[t.Any] = (),
     ) -> Callable:
-        """Assign a callable value to the specified offset."""
+        """Assign a callable value to the specified offset. Declared
+        dependencies get built before the callable, without recursion.
+        """
 
         def decorator(func: Callable) -> t.Any:
             if not callable(func):
@@ -233,6 +702,7 @@ def decorator(func: Callable) -> t.Any:
 
             val = self._cp_func(func=func)
             val.__dependency_injection_mode__ = mode
+            val.__dependency_injection_depends__ = tuple(depends)
             if mode & SERVICE_MODE_EXTENDED:
                 val.__dependency_injection_callable_base__ = self.get(key, None)
             if mode & SERVICE_MODE_KEYWORDED:
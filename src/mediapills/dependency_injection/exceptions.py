@@ -54,3 +54,9 @@ class RecursionInfiniteLoopError(BaseInjectorException, RecursionError):
     """The interpreter detect infinite services dependency depth."""
 
     pass
+
+
+class MemoryBudgetException(BaseInjectorException):
+    """A service retains more memory than its budget allows."""
+
+    pass
@@ -0,0 +1,285 @@
+# Copyright (c) 2021-2021 Mediapills Dependency Injection Authors.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import gc
+import operator
+import sys
+import threading
+import tracemalloc
+import types
+import typing as t
+
+from mediapills.dependency_injection.exceptions import MemoryBudgetException
+
+__all__ = ["MemoryFootprint", "MemoryReport", "MemoryTracker"]
+
+Callable = t.Callable[..., t.Any]
+
+"""Objects shared by the whole interpreter, never owned by a service."""
+SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+
+def _start_tracing() -> None:
+    """Start tracing memory allocations unless already traced."""
+    global _tracing_users, _tracing_started
+
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def _stop_tracing() -> None:
+    """Stop tracing memory allocations once the last tracker is done, if a
+    tracker started it.
+    """
+    global _tracing_users, _tracing_started
+
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+def deep_size(obj: t.Any, exclude: t.Iterable[t.Any] = ()) -> int:
+    """Return the number of bytes held by an object and everything it refers to."""
+    seen = {id(o) for o in exclude}
+    pending = [obj]
+    size = 0
+
+    while pending:
+        item = pending.pop()
+        if id(item) in seen or isinstance(item, SHARED_TYPES):
+            continue
+
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        pending.extend(gc.get_referents(item))
+
+    return size
+
+
+class MemoryFootprint:
+    """Memory accounting of a single service."""
+
+    def __init__(self, key: t.Any, size: int) -> None:
+        """Create a new object."""
+        self.key = key
+        self.size = size
+        self.retained = size
+        self.dependencies: t.Set[t.Any] = set()
+        self.samples: t.List[int] = []
+        self.concurrent = False
+
+    @property
+    def growing(self) -> bool:
+        """Whether the service kept growing on every measurement after it was built."""
+        if len(self.samples) < 2:
+            return False
+
+        pairs = zip(self.samples, self.samples[1:])
+
+        return all(a <= b for a, b in pairs) and self.samples[-1] > self.samples[0]
+
+    def __repr__(self) -> str:
+        """Return the canonical string representation of the object."""
+        return "<MemoryFootprint {!r} size={} retained={}{}>".format(
+            self.key, self.size, self.retained, " concurrent" if self.concurrent else ""
+        )
+
+
+class MemoryTracker:
+    """Attribute bytes allocated by service factories with tracemalloc.
+
+    The traced memory counter is process wide, so footprints of services
+    built while another thread was building are flagged as `concurrent`
+    and should not be trusted.
+    """
+
+    def __init__(self) -> None:
+        """Create a new object and start tracing memory allocations if needed."""
+        self.footprints: t.Dict[t.Any, MemoryFootprint] = dict()
+        self.dependencies: t.Dict[t.Any, t.Set[t.Any]] = dict()
+        self.dependents: t.Dict[t.Any, t.Set[t.Any]] = dict()
+        self._stacks: t.Dict[int, t.List[t.List[t.Any]]] = dict()
+        self._lock = threading.Lock()
+        self._tracing = True
+
+        _start_tracing()
+
+    def stop(self) -> None:
+        """Stop tracing memory allocations if no other tracker needs them."""
+        if self._tracing:
+            _stop_tracing()
+            self._tracing = False
+
+    def touch(self, key: t.Any) -> None:
+        """Record a lookup made while another service is being built."""
+        stack = self._stacks.get(threading.get_ident())
+        if not stack or stack[-1][0] == key:
+            return
+
+        parent = stack[-1][0]
+        with self._lock:
+            self.dependencies.setdefault(parent, set()).add(key)
+            self.dependents.setdefault(key, set()).add(parent)
+
+    def forget(self, key: t.Any) -> None:
+        """Drop the footprint and dependency edges of a removed service."""
+        with self._lock:
+            self.footprints.pop(key, None)
+
+            for dep in self.dependencies.pop(key, ()):
+                self.dependents.get(dep, set()).discard(key)
+
+            for parent in self.dependents.pop(key, ()):
+                self.dependencies.get(parent, set()).discard(key)
+
+    def build(self, key: t.Any, factory: Callable, container: t.Any) -> t.Any:
+        """Invoke a service factory measuring the bytes it allocates."""
+        ident = threading.get_ident()
+        frame = [key, 0, False]
+
+        with self._lock:
+            stack = self._stacks.setdefault(ident, [])
+            if len(self._stacks) > 1:
+                for frames in self._stacks.values():
+                    for item in frames:
+                        item[2] = True
+                frame[2] = True
+            stack.append(frame)
+
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            result = factory(container)
+        finally:
+            with self._lock:
+                stack.pop()
+                if not stack:
+                    del self._stacks[ident]
+        allocated = tracemalloc.get_traced_memory()[0] - before
+
+        footprint = MemoryFootprint(key, max(allocated - frame[1], 0))
+        footprint.concurrent = frame[2]
+        footprint.samples.append(deep_size(result, exclude=(container,)))
+
+        with self._lock:
+            self.footprints[key] = footprint
+
+        if stack:
+            stack[-1][1] += allocated
+
+        return result
+
+
+class MemoryReport:
+    """Per-service memory footprint report."""
+
+    def __init__(self, tracker: MemoryTracker, container: t.Any) -> None:
+        """Create a new object."""
+        self._tracker = tracker
+        self._container = container
+        self._footprints = tracker.footprints
+
+        for key, footprint in self._footprints.items():
+            footprint.dependencies = set(tracker.dependencies.get(key, ()))
+
+        for key in self._footprints:
+            self._footprints[key].retained = self._retained(key)
+
+    def _owned(self, key: t.Any) -> t.List[t.Any]:
+        """Return dependencies used by the specified service only."""
+        return [
+            dep
+            for dep in self._tracker.dependencies.get(key, ())
+            if dep in self._footprints and self._tracker.dependents.get(dep) == {key}
+        ]
+
+    def _retained(self, key: t.Any) -> int:
+        """Return bytes of a service including its exclusively owned dependencies."""
+        size = 0
+        pending = [key]
+        seen: t.Set[t.Any] = set()
+
+        while pending:
+            item = pending.pop()
+            if item in seen:
+                continue
+
+            seen.add(item)
+            size += self._footprints[item].size
+            pending.extend(self._owned(item))
+
+        return size
+
+    def __getitem__(self, key: t.Any) -> MemoryFootprint:
+        """Return the footprint of the specified service."""
+        return self._footprints[key]
+
+    def __iter__(self) -> t.Iterator[MemoryFootprint]:
+        """Iterate over footprints, largest first."""
+        return iter(self.sorted())
+
+    def __len__(self) -> int:
+        """Return the number of measured services."""
+        return len(self._footprints)
+
+    def sorted(self, by: str = "retained") -> t.List[MemoryFootprint]:
+        """Return footprints sorted by `retained` or `size` bytes, largest first."""
+        if by not in ("retained", "size"):
+            raise ValueError(by)
+
+        return sorted(
+            self._footprints.values(), key=operator.attrgetter(by), reverse=True
+        )
+
+    def measure(self) -> None:
+        """Sample the current size of every built service."""
+        for key, footprint in self._footprints.items():
+            if key in self._container._raw:
+                value = self._container[key]
+                footprint.samples.append(deep_size(value, exclude=(self._container,)))
+
+    def growing(self) -> t.List[MemoryFootprint]:
+        """Return services whose size kept growing after construction."""
+        return [f for f in self.sorted() if f.growing]
+
+    def concurrent(self) -> t.List[MemoryFootprint]:
+        """Return services built while another thread was building, whose
+        footprints are unreliable.
+        """
+        return [f for f in self.sorted() if f.concurrent]
+
+    def check(self, budgets: t.Mapping[t.Any, int]) -> None:
+        """Raise an exception when a service retains more bytes than its budget."""
+        exceeded = {
+            key: self._footprints[key].retained
+            for key, budget in budgets.items()
+            if key in self._footprints and self._footprints[key].retained > budget
+        }
+
+        if exceeded:
+            raise MemoryBudgetException(exceeded)
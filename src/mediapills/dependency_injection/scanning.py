@@ -0,0 +1,301 @@
+# Copyright (c) 2021-2021 Mediapills Dependency Injection Authors.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import types
+import typing as t
+
+from mediapills.dependency_injection import Container
+from mediapills.dependency_injection import SERVICE_MODE_COMMON
+from mediapills.dependency_injection import SERVICE_MODES
+from mediapills.dependency_injection.exceptions import ExpectedCallableException
+
+__all__ = ["LazyService", "ServiceIndex", "build_index", "service"]
+
+Callable = t.Callable[..., t.Any]
+
+"""Attribute holding services declared by a module level callable or class member."""
+SCAN_ATTRIBUTE = "__dependency_injection_scan__"
+
+"""Version of the on-disk index format."""
+INDEX_VERSION = 1
+
+
+def service(
+    key: str, mode: int = SERVICE_MODE_COMMON, depends: t.Sequence[t.Any] = ()
+) -> Callable:
+    """Declare a module level callable or a class member as a service, only
+    recording metadata for the scan step.
+    """
+
+    def decorator(func: Callable) -> t.Any:
+        if not callable(func):
+            raise ExpectedCallableException()
+
+        if mode > sum(SERVICE_MODES):
+            raise ValueError(mode)
+
+        declared = getattr(func, SCAN_ATTRIBUTE, ())
+        setattr(func, SCAN_ATTRIBUTE, (*declared, (key, mode, tuple(depends))))
+
+        return func
+
+    return decorator
+
+
+class LazyService:
+    """Callable importing a scanned service on first use."""
+
+    def __init__(self, target: str, mode: int, depends: t.Sequence[t.Any]) -> None:
+        """Create a new object."""
+        self.target = target
+        self.__dependency_injection_mode__ = mode
+        self.__dependency_injection_depends__ = tuple(depends)
+
+    def __call__(self, container: Container) -> t.Any:
+        """Import the service callable and invoke it."""
+        module, _, qualname = self.target.partition(":")
+
+        func: t.Any = importlib.import_module(module)
+        for name in qualname.split("."):
+            func = getattr(func, name)
+
+        return func(container)
+
+    def __repr__(self) -> str:
+        """Return the canonical string representation of the object."""
+        return "<LazyService {!r}>".format(self.target)
+
+
+def _digest(path: str) -> str:
+    """Return the SHA-256 digest of a file."""
+    with open(path, "rb") as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+def _sources(package: str) -> t.Dict[str, str]:
+    """Return source files of a package by module name without importing
+    its modules. Scripts, that is `__main__` modules, files which are not
+    valid module names and directories which are not packages, are skipped.
+    """
+    spec = importlib.util.find_spec(package)
+    if spec is None:
+        raise ModuleNotFoundError(package)
+
+    if spec.submodule_search_locations is None:
+        return {package: str(spec.origin)}
+
+    sources = dict()
+    for location in spec.submodule_search_locations:
+        for root, dirs, files in os.walk(location):
+            dirs[:] = sorted(
+                d
+                for d in dirs
+                if d.isidentifier()
+                and os.path.isfile(os.path.join(root, d, "__init__.py"))
+            )
+            parts = os.path.relpath(root, location).split(os.sep)
+            prefix = ".".join([package, *[p for p in parts if p != "."]])
+
+            for file in sorted(files):
+                name, ext = os.path.splitext(file)
+                if ext != ".py" or name == "__main__" or not name.isidentifier():
+                    continue
+
+                module = prefix if name == "__init__" else prefix + "." + name
+                sources[module] = os.path.join(root, file)
+
+    return sources
+
+
+def _declared(module: types.ModuleType) -> t.Iterator[t.Tuple[t.Any, str]]:
+    """Yield services declared by callables of a module, including class
+    members, once per callable, with the attribute path they are bound to.
+    """
+    seen: t.Set[int] = set()
+    namespaces: t.List[t.Tuple[str, t.Dict[str, t.Any]]] = [("", vars(module))]
+
+    while namespaces:
+        prefix, namespace = namespaces.pop()
+        for name, obj in list(namespace.items()):
+            func = getattr(obj, "__func__", obj)
+            if id(func) in seen or getattr(func, "__module__", None) != module.__name__:
+                continue
+
+            seen.add(id(func))
+            if inspect.isclass(func):
+                namespaces.append((prefix + name + ".", vars(func)))
+
+            for declared in getattr(func, SCAN_ATTRIBUTE, ()):
+                yield declared, prefix + name
+
+
+class ServiceIndex:
+    """On-disk index of services declared across a package."""
+
+    def __init__(
+        self,
+        package: str,
+        sources: t.Dict[str, t.Dict[str, t.Any]],
+        services: t.List[t.Dict[str, t.Any]],
+    ) -> None:
+        """Create a new object."""
+        self.package = package
+        self.sources = sources
+        self.services = services
+        self.changed: t.Set[str] = set()
+        self.refreshed = False
+
+    @classmethod
+    def scan(cls, package: str, reload: t.Iterable[str] = ()) -> "ServiceIndex":
+        """Import every module of a package and collect declared services.
+        Modules already imported are reused, except those listed in `reload`.
+        Raise an exception when a key is declared more than once.
+        """
+        reload = set(reload)
+        if reload:
+            importlib.invalidate_caches()
+
+        sources = dict()
+        services = []
+        targets: t.Dict[t.Any, str] = dict()
+
+        for name, path in _sources(package).items():
+            sources[name] = {
+                "path": path,
+                "mtime": os.stat(path).st_mtime_ns,
+                "sha256": _digest(path),
+            }
+
+            if name in reload and name in sys.modules:
+                module = importlib.reload(sys.modules[name])
+            else:
+                module = importlib.import_module(name)
+
+            for (key, mode, depends), path in _declared(module):
+                target = "{}:{}".format(name, path)
+                if key in targets:
+                    raise ValueError(key, targets[key], target)
+
+                targets[key] = target
+                services.append(
+                    {
+                        "key": key,
+                        "target": target,
+                        "mode": mode,
+                        "depends": list(depends),
+                    }
+                )
+
+        return cls(package, sources, services)
+
+    @classmethod
+    def load(cls, path: str) -> "ServiceIndex":
+        """Read an index file."""
+        with open(path) as fp:
+            data = json.load(fp)
+
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(data.get("version"))
+
+        return cls(data["package"], data["sources"], data["services"])
+
+    def save(self, path: str) -> None:
+        """Write the index file."""
+        with open(path, "w") as fp:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "package": self.package,
+                    "sources": self.sources,
+                    "services": self.services,
+                },
+                fp,
+            )
+
+    def is_stale(self) -> bool:
+        """Check whether package sources changed since the scan, comparing
+        digests only of files whose modification time changed. Modules found
+        changed or added are kept in `changed`, modification times of files
+        with an unchanged digest are refreshed.
+        """
+        sources = _sources(self.package)
+        self.changed = set(sources).difference(self.sources)
+        stale = sources.keys() != self.sources.keys()
+
+        for module, path in sources.items():
+            recorded = self.sources.get(module)
+            if recorded is None:
+                continue
+
+            if recorded["path"] != path:
+                self.changed.add(module)
+                continue
+
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == recorded["mtime"]:
+                continue
+
+            if _digest(path) != recorded["sha256"]:
+                self.changed.add(module)
+            else:
+                recorded["mtime"] = mtime
+                self.refreshed = True
+
+        return stale or bool(self.changed)
+
+    def register(self, container: Container) -> None:
+        """Assign lazily imported services to the container."""
+        container.register_many(
+            (s["key"], LazyService(s["target"], s["mode"], s["depends"]))
+            for s in self.services
+        )
+
+
+def build_index(package: str, path: str) -> ServiceIndex:
+    """Load the index file of a package, scanning the package and saving the
+    index again when it is missing or stale. Changed modules already imported
+    are reloaded by the scan.
+    """
+    changed: t.Set[str] = set()
+    if os.path.exists(path):
+        try:
+            index = ServiceIndex.load(path)
+        except ValueError:
+            pass
+        else:
+            if index.package == package:
+                if not index.is_stale():
+                    if index.refreshed:
+                        index.save(path)
+                    return index
+
+                changed = index.changed
+
+    index = ServiceIndex.scan(package, reload=changed)
+    index.save(path)
+
+    return index
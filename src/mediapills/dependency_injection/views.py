@@ -0,0 +1,64 @@
+# Copyright (c) 2021-2021 Mediapills Dependency Injection Authors.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import typing as t
+from collections.abc import ItemsView
+from collections.abc import Mapping
+from collections.abc import ValuesView
+
+__all__ = ["DefinitionsView", "LazyItemsView", "LazyValuesView"]
+
+
+class LazyValuesView(ValuesView):  # type: ignore
+    """Container values view resolving an offset only when it is yielded."""
+
+    pass
+
+
+class LazyItemsView(ItemsView):  # type: ignore
+    """Container items view resolving an offset only when it is yielded."""
+
+    pass
+
+
+class DefinitionsView(Mapping):  # type: ignore
+    """Read-only view of parameters and closures defining container objects,
+    own offsets first, then mounted ones.
+    """
+
+    def __init__(self, container: t.Any) -> None:
+        """Create a new object."""
+        self._container = container
+
+    def __getitem__(self, key: t.Any) -> t.Any:
+        """Return the definition at specified offset."""
+        return self._container.raw(key)
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        """Iterate over own and mounted container offsets."""
+        return iter(list(self._container))
+
+    def __len__(self) -> int:
+        """Return the number of own and mounted container offsets."""
+        return len(self._container)
+
+    def __contains__(self, key: t.Any) -> bool:
+        """Check whether an offset is defined."""
+        return key in self._container
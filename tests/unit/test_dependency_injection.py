@@ -18,15 +18,24 @@
 # LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import json
+import os
+import tempfile
+import threading
+import time
 from typing import Any
+from typing import Callable
+from typing import List
 from unittest import TestCase
 
 from parameterized import parameterized
 
 from mediapills.dependency_injection import Container
+from mediapills.dependency_injection import SERVICE_MODE_FACTORY
 from mediapills.dependency_injection.exceptions import ExpectedCallableException
 from mediapills.dependency_injection.exceptions import FrozenServiceException
 from mediapills.dependency_injection.exceptions import RecursionInfiniteLoopError
+from mediapills.dependency_injection.exceptions import UnknownIdentifierException
 
 DATA_TYPES_PARAMETRIZED_INPUT = [
     ("str", "value"),  # Check text type (str)
@@ -147,6 +156,82 @@ def test_recursive_get_should_raise_error(self) -> None:
         with self.assertRaises(RecursionInfiniteLoopError):
             _ = obj["a"]
 
+    def test_failed_get_should_restore_definition(self) -> None:
+        obj = Container()
+        obj["a"] = lambda di: 1 / 0
+
+        with self.assertRaises(ZeroDivisionError):
+            _ = obj["a"]
+
+        with self.assertRaises(ZeroDivisionError):
+            _ = obj["a"]
+
+    def test_concurrent_get_should_build_once(self) -> None:
+        calls: List[int] = []
+
+        def slow(di: Container) -> object:
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        obj = Container({"slow": slow})
+        results: List[Any] = []
+        threads = [
+            threading.Thread(target=lambda: results.append(obj["slow"]))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(1, len({id(result) for result in results}))
+
+        del obj["slow"]
+        obj["slow"] = slow
+        thread = threading.Thread(target=lambda: results.append(obj["slow"]))
+        thread.start()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(2, len(calls))
+
+    def test_concurrent_cycle_should_raise_error(self) -> None:
+        barrier = threading.Barrier(2)
+        waited: List[str] = []
+
+        def wait(key: str) -> None:
+            if key not in waited:
+                waited.append(key)
+                barrier.wait(5)
+
+        def first(di: Container) -> Any:
+            wait("a")
+            return di["b"]
+
+        def second(di: Container) -> Any:
+            wait("b")
+            return di["a"]
+
+        obj = Container({"a": first, "b": second})
+        errors: List[BaseException] = []
+
+        def lookup(key: str) -> None:
+            try:
+                _ = obj[key]
+            except RecursionInfiniteLoopError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=lookup, args=(k,)) for k in "ab"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(2, len(errors))
+
     def test_keys_should_return_list(self) -> None:
 
         obj = Container()
@@ -186,6 +271,36 @@ def test_items_should_return_list(self) -> None:
             [("1", "one"), ("2", "two"), ("1 + 2", "one + two")], [*obj.items()]
         )
 
+    def test_values_should_resolve_lazily(self) -> None:
+
+        built: List[str] = []
+
+        def two(di: Container) -> str:
+            built.append("2")
+            return "two"
+
+        obj = Container()
+        obj["1"] = lambda x: "one"
+        obj["2"] = two
+
+        self.assertEqual("one", next(iter(obj.values())))
+        self.assertListEqual([], built)
+
+    def test_items_should_resolve_lazily(self) -> None:
+
+        built: List[str] = []
+
+        def one(di: Container) -> str:
+            built.append("1")
+            return "one"
+
+        obj = Container()
+        obj["1"] = one
+        obj["2"] = lambda x: "two"
+
+        self.assertIn(("2", "two"), obj.items())
+        self.assertListEqual([], built)
+
     def test_copy_should_return_warmed_copy(self) -> None:
 
         obj = Container()
@@ -212,6 +327,76 @@ def test_update_should_raise_error(self) -> None:
         with self.assertRaises(FrozenServiceException):
             obj.update({"1": lambda x: "uno"})
 
+    def test_register_many_should_set_values(self) -> None:
+
+        obj = Container()
+        obj.register_many([("1", "one"), ("2", lambda x: "two")])
+
+        self.assertEqual("one", obj["1"])
+        self.assertEqual("two", obj["2"])
+
+    def test_register_many_should_raise_error_before_insert(self) -> None:
+
+        obj = Container()
+        obj["1"] = lambda x: "one"
+        _ = obj["1"]
+
+        with self.assertRaises(FrozenServiceException):
+            obj.register_many({"2": "two", "1": "uno"})
+
+        self.assertNotIn("2", obj)
+
+    def test_update_from_container_should_share_objects(self) -> None:
+
+        calls: List[int] = []
+
+        def factory(di: Container) -> int:
+            calls.append(1)
+            return len(calls)
+
+        src = Container({"b": factory})
+        dst = Container()
+        dst.update(src)
+
+        self.assertEqual(src["b"], dst["b"])
+        self.assertEqual(1, len(calls))
+
+    def test_register_many_should_tag_callables(self) -> None:
+
+        func = lambda x: "one"  # noqa: E731
+
+        obj = Container()
+        obj.register_many({"1": func})
+
+        self.assertEqual(1, getattr(func, "__dependency_injection_mode__"))
+
+    def test_get_many_should_return_values(self) -> None:
+
+        obj = Container()
+        obj["1"] = lambda x: "one"
+        obj["2"] = "two"
+        obj["1 + 2"] = lambda x: "{} + {}".format(x["1"], x["2"])
+
+        self.assertDictEqual(
+            {"1 + 2": "one + two", "1": "one", "2": "two"},
+            obj.get_many(["1 + 2", "1", "2", "1"]),
+        )
+
+    def test_get_many_missing_should_raise_error(self) -> None:
+
+        calls: List[int] = []
+
+        def one(di: Container) -> str:
+            calls.append(1)
+            return "one"
+
+        obj = Container({"1": one})
+
+        with self.assertRaises(KeyError):
+            obj.get_many(["1", "missing"])
+
+        self.assertListEqual([], calls)
+
 
 class TestContainer(TestCase):
     """Test Custom Dict Container implementation."""
@@ -245,6 +430,232 @@ def dummy(di: Container):  # type: ignore
 
         self.assertEqual("Dummy output", obj["test"])
 
+    def test_definitions_should_not_build(self) -> None:
+
+        built: List[str] = []
+
+        def func(di: Container) -> str:
+            built.append("func")
+            return "test"
+
+        obj = Container({"param": "value", "func": func})
+
+        self.assertDictEqual({"param": "value", "func": func}, dict(obj.definitions()))
+        self.assertListEqual([], built)
+
+    def test_scan_should_filter_without_building(self) -> None:
+        obj = Container({"db.host": "localhost", "db.port": 3306, "cache": None})
+
+        @obj.service("db.conn", mode=SERVICE_MODE_FACTORY)
+        def conn(di: Container):  # type: ignore
+            raise AssertionError("should not be built")
+
+        self.assertListEqual(
+            ["db.host", "db.port", "db.conn"], [*obj.scan(prefix="db.")]
+        )
+        self.assertListEqual(["db.conn"], [*obj.scan(mode=SERVICE_MODE_FACTORY)])
+
+    def test_record_should_save_build_order(self) -> None:
+
+        built: List[str] = []
+
+        def factory(key: str) -> Callable[[Container], str]:
+            def build(di: Container) -> str:
+                built.append(key)
+                return key if key != "a" else "{}{}".format(di["b"], di["param"])
+
+            return build
+
+        obj = Container({"param": "value"})
+        obj["a"] = factory("a")
+        obj["b"] = factory("b")
+        obj["c"] = factory("c")
+        obj.record(limit=2)
+
+        _ = obj["a"], obj["a"], obj["c"]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "manifest.json")
+            obj.save_manifest(path)
+
+            other = Container(obj.definitions())
+            built.clear()
+
+            self.assertListEqual(["b", "a"], other.warm_up(path, workers=2))
+            self.assertCountEqual(["a", "b"], built)
+
+    def test_warm_up_should_skip_unknown(self) -> None:
+
+        obj = Container({"a": lambda di: "a"})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "manifest.json")
+            with open(path, "w") as fp:
+                fp.write('{"version": 1, "keys": ["gone", "a"]}')
+
+            self.assertListEqual(["a"], obj.warm_up(path))
+
+    def test_record_mounted_should_match_own(self) -> None:
+
+        def bad(di: Container) -> None:
+            raise ValueError()
+
+        infra = Container({"built": lambda di: "b", "bad": bad, "db": lambda di: "d"})
+        _ = infra["built"]
+        app = Container({"param": "value"})
+        app.mount(infra)
+        app.record()
+
+        with self.assertRaises(ValueError):
+            _ = app["bad"]
+        _ = app["built"], app["db"], app["db"], app["param"]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "manifest.json")
+            app.save_manifest(path)
+
+            with open(path) as fp:
+                self.assertListEqual(["db"], json.load(fp)["keys"])
+
+    def test_warm_up_unknown_version_should_raise_error(self) -> None:
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "manifest.json")
+            with open(path, "w") as fp:
+                fp.write('{"version": 2, "keys": []}')
+
+            with self.assertRaises(ValueError):
+                Container().warm_up(path)
+
+    def test_save_manifest_without_record_should_raise_error(self) -> None:
+
+        with self.assertRaises(RuntimeError):
+            Container().save_manifest("manifest.json")
+
+    def test_mount_should_share_services(self) -> None:
+
+        root = Container({"db": lambda di: object()})
+        app = Container({"repo": lambda di: (di["db"],)})
+        app.mount(root)
+
+        self.assertIn("db", app)
+        self.assertIs(root["db"], app["db"])
+        self.assertIs(root["db"], app["repo"][0])
+
+    def test_mount_prefix_should_namespace(self) -> None:
+
+        billing = Container({"db": "billing"})
+        app = Container({"db": "app"})
+        app.mount(billing, prefix="billing.")
+
+        self.assertEqual("app", app["db"])
+        self.assertEqual("billing", app["billing.db"])
+        self.assertEqual("billing", app.raw("billing.db"))
+
+    def test_mount_should_index_registrations(self) -> None:
+
+        infra = Container()
+        feature = Container()
+        app = Container()
+        feature.mount(infra, prefix="infra.")
+        app.mount(feature, prefix="feature.")
+
+        infra["db"] = lambda di: ["sqlite"]
+        self.assertIs(infra["db"], app["feature.infra.db"])
+
+        feature["infra.db"] = "postgres"
+        self.assertEqual("postgres", app["feature.infra.db"])
+
+        del feature["infra.db"]
+        self.assertEqual(["sqlite"], app["feature.infra.db"])
+
+        del infra["db"]
+        self.assertNotIn("feature.infra.db", app)
+        with self.assertRaises(KeyError):
+            _ = app["feature.infra.db"]
+
+    def test_mount_get_should_use_index(self) -> None:
+
+        app = Container({"own": "app"})
+        app.mount(Container({"db": "sqlite", None: "none"}))
+
+        self.assertEqual("sqlite", app.get("db"))
+        self.assertEqual("none", app[None])
+        self.assertEqual("default", app.get("missing", "default"))
+
+    def test_mount_definitions_should_include_mounted(self) -> None:
+
+        app = Container({"db": "app"})
+        app.mount(Container({"db": "infra", "cache": "redis"}))
+        definitions = app.definitions()
+
+        self.assertListEqual(["cache"], [*app.mounted()])
+        self.assertDictEqual({"db": "app", "cache": "redis"}, dict(definitions))
+        self.assertEqual(2, len(definitions))
+        self.assertIn("cache", definitions)
+
+    def test_mount_should_keep_mapping_contract(self) -> None:
+
+        app = Container({"db": "app"})
+        app.mount(Container({"db": "infra", "cache": lambda di: "redis"}))
+
+        self.assertListEqual(["db", "cache"], [*app])
+        self.assertListEqual(["db", "cache"], [*app.keys()])
+        self.assertIn("cache", app.keys())
+        self.assertEqual(2, len(app))
+        self.assertListEqual(["app", "redis"], [*app.values()])
+        self.assertListEqual([("db", "app"), ("cache", "redis")], [*app.items()])
+        self.assertDictEqual({"db": "app", "cache": "redis"}, app.copy())
+
+    def test_mount_later_should_take_precedence(self) -> None:
+
+        app = Container()
+        app.mount(Container({"key": "first"}))
+        app.mount(Container({"key": "second"}))
+
+        self.assertEqual("second", app["key"])
+
+    def test_mount_cycle_should_raise_error(self) -> None:
+
+        parent = Container()
+        child = Container()
+        parent.mount(child)
+
+        with self.assertRaises(ValueError):
+            child.mount(parent)
+
+        with self.assertRaises(ValueError):
+            parent.mount(parent)
+
+    def test_service_depends_should_build_deep_chain(self) -> None:
+        obj = Container({"stage.0": 0})
+
+        for i in range(1, 10001):
+            prev = "stage.{}".format(i - 1)
+            obj.service("stage.{}".format(i), depends=[prev])(
+                lambda di, prev=prev: di[prev] + 1
+            )
+
+        self.assertEqual(10000, obj["stage.10000"])
+
+    def test_service_depends_cycle_should_report_path(self) -> None:
+        obj = Container()
+        obj.service("a", depends=["b"])(lambda di: di["b"])
+        obj.service("b", depends=["c"])(lambda di: di["c"])
+        obj.service("c", depends=["a"])(lambda di: di["a"])
+
+        with self.assertRaises(RecursionInfiniteLoopError) as ctx:
+            _ = obj["a"]
+
+        self.assertEqual(("a", ("a", "b", "c", "a")), ctx.exception.args)
+
+    def test_service_depends_unknown_should_raise_error(self) -> None:
+        obj = Container()
+        obj.service("a", depends=["missing"])(lambda di: di["missing"])
+
+        with self.assertRaises(UnknownIdentifierException):
+            _ = obj["a"]
+
     @parameterized.expand(DATA_TYPES_PARAMETRIZED_INPUT)  # type: ignore
     def test_service_decorator_should_not_accept_scalar(
         self, key: str, val: Any
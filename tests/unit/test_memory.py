@@ -0,0 +1,203 @@
+# Copyright (c) 2021-2021 Mediapills Dependency Injection Authors.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import threading
+import tracemalloc
+from typing import Any
+from typing import List
+from unittest import TestCase
+
+from mediapills.dependency_injection import Container
+from mediapills.dependency_injection.exceptions import MemoryBudgetException
+from mediapills.dependency_injection.exceptions import RecursionInfiniteLoopError
+
+
+class TestMemoryReport(TestCase):
+    """Test Container memory accounting."""
+
+    def setUp(self) -> None:
+        self.obj = Container()
+        self.obj.track_memory()
+
+    def tearDown(self) -> None:
+        self.obj.track_memory(False)
+
+    def test_report_disabled_should_raise_error(self) -> None:
+
+        with self.assertRaises(RuntimeError):
+            Container().memory_report()
+
+    def test_report_should_attribute_bytes(self) -> None:
+
+        self.obj["small"] = lambda di: bytearray(1000)
+        self.obj["large"] = lambda di: bytearray(100000)
+        _ = self.obj["small"], self.obj["large"]
+
+        report = self.obj.memory_report()
+
+        self.assertEqual(["large", "small"], [f.key for f in report.sorted()])
+        self.assertGreaterEqual(report["large"].size, 100000)
+        self.assertLess(report["small"].size, 100000)
+
+    def test_report_should_retain_exclusive_dependencies(self) -> None:
+
+        self.obj["buffer"] = lambda di: bytearray(100000)
+        self.obj["shared"] = lambda di: bytearray(50000)
+        self.obj["owner"] = lambda di: (di["buffer"], di["shared"])
+        self.obj["other"] = lambda di: di["shared"]
+        _ = self.obj["owner"], self.obj["other"]
+
+        report = self.obj.memory_report()
+
+        self.assertLess(report["owner"].size, 50000)
+        self.assertGreaterEqual(report["owner"].retained, 100000)
+        self.assertLess(report["owner"].retained, 150000)
+        self.assertEqual({"buffer", "shared"}, report["owner"].dependencies)
+
+    def test_get_many_should_record_dependencies(self) -> None:
+
+        self.obj["a"] = lambda di: 1
+        self.obj["b"] = lambda di: 2
+        _ = self.obj["a"]
+        self.obj["sum"] = lambda di: sum(di.get_many(["a", "b"]).values())
+        _ = self.obj["sum"]
+
+        self.assertEqual({"a", "b"}, self.obj.memory_report()["sum"].dependencies)
+
+    def test_report_should_forget_removed_services(self) -> None:
+
+        self.obj["b"] = lambda di: bytearray(1000)
+        self.obj["a"] = lambda di: di["b"]
+        _ = self.obj["a"]
+        del self.obj["a"], self.obj["b"]
+
+        self.obj["a"] = lambda di: bytearray(1000)
+        self.obj["b"] = lambda di: di["a"]
+        _ = self.obj["b"]
+
+        report = self.obj.memory_report()
+
+        self.assertEqual({"a", "b"}, {f.key for f in report})
+        self.assertEqual(set(), report["a"].dependencies)
+        self.assertEqual({"a"}, report["b"].dependencies)
+
+        self.obj.clear()
+        self.assertEqual(0, len(self.obj.memory_report()))
+
+    def test_report_should_handle_cyclic_lookups(self) -> None:
+
+        def b(di: Container) -> Any:
+            try:
+                return di["a"]
+            except RecursionInfiniteLoopError:
+                return None
+
+        self.obj["a"] = lambda di: di["b"]
+        self.obj["b"] = b
+        _ = self.obj["a"]
+
+        report = self.obj.memory_report()
+
+        self.assertEqual({"b"}, report["a"].dependencies)
+        self.assertEqual({"a"}, report["b"].dependencies)
+
+    def test_measure_should_not_build_removed_services(self) -> None:
+
+        calls = []
+
+        def factory(di: Container) -> List[Any]:
+            calls.append(1)
+            return []
+
+        self.obj["cache"] = factory
+        _ = self.obj["cache"]
+        report = self.obj.memory_report()
+
+        del self.obj["cache"]
+        self.obj["cache"] = factory
+        report.measure()
+
+        self.assertEqual(1, len(calls))
+
+    def test_measure_should_flag_growing(self) -> None:
+
+        self.obj["cache"] = lambda di: []
+        self.obj["static"] = lambda di: [1, 2, 3]
+        cache: List[Any] = self.obj["cache"]
+        _ = self.obj["static"]
+
+        report = self.obj.memory_report()
+        for i in range(3):
+            cache.extend(bytearray(1000) for _ in range(10))
+            report.measure()
+
+        self.assertEqual(["cache"], [f.key for f in report.growing()])
+
+    def test_check_over_budget_should_raise_error(self) -> None:
+
+        self.obj["large"] = lambda di: bytearray(100000)
+        _ = self.obj["large"]
+
+        report = self.obj.memory_report()
+        report.check({"large": 200000})
+
+        with self.assertRaises(MemoryBudgetException):
+            report.check({"large": 1000})
+
+    def test_concurrent_builds_should_be_flagged(self) -> None:
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def large(di: Container) -> bytearray:
+            started.set()
+            release.wait(5)
+            return bytearray(200000)
+
+        def small(di: Container) -> bytearray:
+            release.set()
+            return bytearray(10)
+
+        self.obj["large"] = large
+        self.obj["small"] = small
+
+        thread = threading.Thread(target=lambda: self.obj["large"])
+        thread.start()
+        started.wait(5)
+        _ = self.obj["small"]
+        thread.join()
+
+        report = self.obj.memory_report()
+
+        self.assertEqual({"large", "small"}, {f.key for f in report.concurrent()})
+        self.assertEqual(set(), report["large"].dependencies)
+
+    def test_untrack_should_keep_tracing_for_other_containers(self) -> None:
+
+        other = Container({"large": lambda di: bytearray(100000)})
+        other.track_memory()
+        self.obj.track_memory(False)
+
+        self.assertTrue(tracemalloc.is_tracing())
+        _ = other["large"]
+        self.assertGreaterEqual(other.memory_report()["large"].size, 100000)
+
+        other.track_memory(False)
+        self.obj.track_memory()
@@ -0,0 +1,211 @@
+# Copyright (c) 2021-2021 Mediapills Dependency Injection Authors.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import os
+import sys
+import tempfile
+from unittest import TestCase
+
+from mediapills.dependency_injection import Container
+from mediapills.dependency_injection import SERVICE_MODE_FACTORY
+from mediapills.dependency_injection.exceptions import ExpectedCallableException
+from mediapills.dependency_injection.scanning import build_index
+from mediapills.dependency_injection.scanning import service
+from mediapills.dependency_injection.scanning import ServiceIndex
+
+MODULE_DB = """
+from mediapills.dependency_injection.scanning import service
+
+
+@service("db.dsn")
+def dsn(di):
+    return "sqlite://"
+
+
+@service("db.conn", depends=["db.dsn"])
+def conn(di):
+    return "connected to " + di["db.dsn"]
+
+
+alias = dsn
+
+
+class Pool:
+    @staticmethod
+    @service("db.pool", depends=["db.conn"])
+    def create(di):
+        return "pool of " + di["db.conn"]
+"""
+
+MODULE_NESTED = """
+from mediapills.dependency_injection.scanning import service
+
+
+def factory():
+    @service("nested")
+    def nested(di):
+        return "nested"
+
+    return nested
+
+
+nested = factory()
+"""
+
+MODULE_API = """
+from mediapills.dependency_injection import SERVICE_MODE_FACTORY
+from mediapills.dependency_injection.scanning import service
+from scanned_app.db import conn
+
+
+@service("api", mode=SERVICE_MODE_FACTORY)
+def api(di):
+    return "api using " + di["db.conn"]
+"""
+
+
+class TestScanning(TestCase):
+    """Test module scanning service registry."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        package = os.path.join(self.tmp.name, "scanned_app")
+        os.makedirs(os.path.join(package, "handlers"))
+        os.makedirs(os.path.join(package, "scripts"))
+
+        for path, source in (
+            ("__init__.py", ""),
+            ("db.py", MODULE_DB),
+            (os.path.join("handlers", "__init__.py"), ""),
+            (os.path.join("handlers", "api.py"), MODULE_API),
+            ("__main__.py", "raise SystemExit('script imported')"),
+            (os.path.join("scripts", "run.py"), "raise SystemExit('script imported')"),
+        ):
+            with open(os.path.join(package, path), "w") as fp:
+                fp.write(source)
+
+        self.index = os.path.join(self.tmp.name, "index.json")
+        sys.path.insert(0, self.tmp.name)
+
+    def tearDown(self) -> None:
+        sys.path.remove(self.tmp.name)
+        for module in [m for m in sys.modules if m.startswith("scanned_app")]:
+            del sys.modules[module]
+        self.tmp.cleanup()
+
+    def unload(self) -> None:
+        for module in [m for m in sys.modules if m.startswith("scanned_app.")]:
+            del sys.modules[module]
+
+    def test_service_should_only_record_metadata(self) -> None:
+
+        def func(di: Container) -> str:
+            return "value"
+
+        self.assertIs(func, service("key")(func))
+        self.assertEqual(
+            (("key", 1, ()),), getattr(func, "__dependency_injection_scan__")
+        )
+
+        with self.assertRaises(ExpectedCallableException):
+            service("key")("value")
+
+    def test_scan_should_collect_declared_services(self) -> None:
+
+        index = ServiceIndex.scan("scanned_app")
+
+        self.assertListEqual(
+            [
+                ("db.dsn", "scanned_app.db:dsn", 1, []),
+                ("db.conn", "scanned_app.db:conn", 1, ["db.dsn"]),
+                ("db.pool", "scanned_app.db:Pool.create", 1, ["db.conn"]),
+                ("api", "scanned_app.handlers.api:api", SERVICE_MODE_FACTORY, []),
+            ],
+            [
+                (s["key"], s["target"], s["mode"], s["depends"])
+                for s in index.services
+            ],
+        )
+        self.assertNotIn("scanned_app.__main__", sys.modules)
+        self.assertNotIn("scanned_app.scripts.run", sys.modules)
+
+    def test_scan_should_index_nested_callables_by_bound_name(self) -> None:
+
+        path = os.path.join(self.tmp.name, "scanned_app", "nested.py")
+        with open(path, "w") as fp:
+            fp.write(MODULE_NESTED)
+
+        obj = Container()
+        ServiceIndex.scan("scanned_app").register(obj)
+
+        self.assertEqual("nested", obj["nested"])
+
+    def test_scan_duplicate_key_should_raise_error(self) -> None:
+
+        path = os.path.join(self.tmp.name, "scanned_app", "copy.py")
+        with open(path, "w") as fp:
+            fp.write(MODULE_DB)
+
+        with self.assertRaises(ValueError):
+            ServiceIndex.scan("scanned_app")
+
+    def test_register_should_import_on_first_use(self) -> None:
+
+        build_index("scanned_app", self.index)
+        self.unload()
+
+        obj = Container()
+        build_index("scanned_app", self.index).register(obj)
+
+        self.assertNotIn("scanned_app.handlers.api", sys.modules)
+        self.assertListEqual(["api"], [*obj.scan(mode=SERVICE_MODE_FACTORY)])
+        self.assertEqual("api using connected to sqlite://", obj["api"])
+        self.assertEqual("pool of connected to sqlite://", obj["db.pool"])
+        self.assertIn("scanned_app.handlers.api", sys.modules)
+
+    def test_index_should_invalidate_on_change(self) -> None:
+
+        index = build_index("scanned_app", self.index)
+        path = os.path.join(self.tmp.name, "scanned_app", "db.py")
+
+        os.utime(path, ns=(0, 0))
+        build_index("scanned_app", self.index)
+        sources = ServiceIndex.load(self.index).sources
+        self.assertEqual(0, sources["scanned_app.db"]["mtime"])
+        self.assertFalse(ServiceIndex.load(self.index).is_stale())
+
+        with open(path, "w") as fp:
+            fp.write(MODULE_DB.replace('"db.dsn")', '"db.url")'))
+        self.assertTrue(index.is_stale())
+
+        with open(os.path.join(self.tmp.name, "scanned_app", "extra.py"), "w") as fp:
+            fp.write(
+                "from mediapills.dependency_injection.scanning import service\n"
+                "extra = service('extra')(lambda di: 'extra')\n"
+            )
+
+        index = build_index("scanned_app", self.index)
+        keys = [s["key"] for s in index.services]
+        self.assertListEqual(["db.url", "db.conn", "db.pool", "extra", "api"], keys)
+        self.assertFalse(ServiceIndex.load(self.index).is_stale())
+
+        obj = Container()
+        index.register(obj)
+        self.assertEqual("extra", obj["extra"])